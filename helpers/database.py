@@ -7,7 +7,8 @@ def get_next_process_time(database, table, column, value_id):
     """Get the next processing time for the specified bot."""
 
     dbrow = database.cursor().execute(
-            f"SELECT next_processing_timestamp FROM {table} WHERE {column} = '{value_id}'"
+            f"SELECT next_processing_timestamp FROM {table} WHERE {column} = ?",
+            (str(value_id),)
         ).fetchone()
 
     # Start with initial time, and substract one second to allow direct processing
@@ -25,9 +26,11 @@ def get_next_process_time(database, table, column, value_id):
 def set_next_process_time(database, table, column, value_id, new_time):
     """Set the next processing time for the specified bot."""
 
+    # Table and column are passed by the caller, only the values can be parameters
     database.execute(
         f"REPLACE INTO {table} ({column}, next_processing_timestamp) "
-        f"VALUES ('{value_id}', {new_time})"
+        "VALUES (?, ?)",
+        (str(value_id), new_time)
     )
 
     database.commit()
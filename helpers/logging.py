@@ -210,3 +210,7 @@ class Logger:
         self.log(message, "debug")
         if self.notify_enabled and notify:
             self.notificationhandler.queue_notification(message)
+
+    def is_debug_enabled(self):
+        """Check if debug level messages are logged."""
+        return self.my_logger.isEnabledFor(logging.DEBUG)
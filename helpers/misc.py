@@ -6,8 +6,8 @@ import time
 from constants.pair import PAIREXCLUDE_EXT
 
 
-def wait_time_interval(logger, notification, time_interval, notify=True):
-    """Wait for time interval."""
+def wait_time_interval(logger, notification, time_interval, notify=True, wakeup_event=None):
+    """Wait for time interval, or until the optional wakeup event is set."""
 
     if time_interval > 0:
         localtime = time.time()
@@ -17,7 +17,11 @@ def wait_time_interval(logger, notification, time_interval, notify=True):
             "Next update in %s at %s" % (str(datetime.timedelta(seconds = time_interval)), timeresult), notify
         )
         notification.send_notification()
-        time.sleep(time_interval)
+        if wakeup_event is None:
+            time.sleep(time_interval)
+        elif wakeup_event.wait(time_interval):
+            logger.info("Woken up before the end of the interval")
+            wakeup_event.clear()
         return True
 
     notification.send_notification()
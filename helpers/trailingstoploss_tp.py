@@ -1,9 +1,25 @@
 """Cyberjunky's 3Commas bot helpers."""
 
 import decimal
+import math
 from helpers.misc import round_decimals_up
 
 
+# Margin used when comparing the total drop of Safety Orders with the profit
+SAFETY_ORDER_DROP_MARGIN = 0.000001
+
+# Known keys of the profit- and safety-config entries, with their type
+SECTION_CONFIG_INT_KEYS = ("activation-so-count", "sl-timeout")
+SECTION_CONFIG_FLOAT_KEYS = (
+    "activation-percentage",
+    "initial-stoploss-percentage",
+    "sl-increment-factor",
+    "tp-increment-factor",
+    "initial-buy-percentage",
+    "buy-increment-factor",
+)
+
+
 def determine_profit_prefix(deal_data):
     """Determine the prefix of the profit for logging"""
 
@@ -13,22 +29,51 @@ def determine_profit_prefix(deal_data):
     return ""
 
 
+def get_bot_db_data(cursor, table, botid):
+    """Get the stored data of all deals of the bot, keyed by deal id."""
+
+    return {
+        row["dealid"]: row
+        for row in cursor.execute(f"SELECT * FROM {table} WHERE botid = ?", (botid,))
+    }
+
+
 def get_profit_db_data(cursor, dealid):
     """Check if deal was already logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM deal_profit WHERE dealid = {dealid}").fetchone()
+    return cursor.execute(
+        "SELECT * FROM deal_profit WHERE dealid = ?", (dealid,)
+    ).fetchone()
 
 
 def get_safety_db_data(cursor, dealid):
     """Check if deal was already logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM deal_safety WHERE dealid = {dealid}").fetchone()
+    return cursor.execute(
+        "SELECT * FROM deal_safety WHERE dealid = ?", (dealid,)
+    ).fetchone()
+
+
+def prepare_section_config(section_config):
+    """Convert the known values of the profit- or safety-config to numbers, once for all deals"""
 
+    preparedconfig = []
 
-def get_pending_order_db_data(cursor, dealid):
-    """Check if order for deal was logged and get stored data."""
+    for entry in section_config:
+        # Other keys are not used, and are kept as they are
+        preparedentry = dict(entry)
+        for key, value in entry.items():
+            if key == "sl-timeout" and value is None:
+                # An older config upgrade could write null, which means no timeout
+                preparedentry[key] = 0
+            elif key in SECTION_CONFIG_INT_KEYS:
+                preparedentry[key] = int(value)
+            elif key in SECTION_CONFIG_FLOAT_KEYS:
+                preparedentry[key] = float(value)
 
-    return cursor.execute(f"SELECT * FROM pending_orders WHERE dealid = {dealid}").fetchone()
+        preparedconfig.append(preparedentry)
+
+    return preparedconfig
 
 
 def check_float(potential_float):
@@ -41,49 +86,62 @@ def check_float(potential_float):
         return False
 
 
-def is_new_deal(cursor, dealid):
-    """Return True if the deal is not know yet, otherwise False"""
-
-    if cursor.execute(f"SELECT * FROM deal_profit WHERE dealid = {dealid}").fetchone():
-        return False
-
-    return True
-
-
 def calculate_slpercentage_base_price_short(sl_price, base_price):
     """Calculate the SL percentage of the base price for a short deal"""
 
-    return round(
-        ((sl_price / base_price) * 100.0) - 100.0,
-        2
-    )
+    return ((sl_price / base_price) * 100.0) - 100.0
 
 
 def calculate_slpercentage_base_price_long(sl_price, base_price):
     """Calculate the SL percentage of the base price for a long deal"""
 
-    return round(
-        100.0 - ((sl_price / base_price) * 100.0),
-        2
-    )
+    return 100.0 - ((sl_price / base_price) * 100.0)
 
 
 def calculate_average_price_sl_percentage_short(sl_price, average_price):
     """Calculate the SL percentage based on the average price for a short deal"""
 
-    return round(
-        100.0 - ((sl_price / average_price) * 100.0),
-        2
-    )
+    return 100.0 - ((sl_price / average_price) * 100.0)
 
 
 def calculate_average_price_sl_percentage_long(sl_price, average_price):
     """Calculate the SL percentage based on the average price for a long deal"""
 
-    return round(
-        ((sl_price / average_price) * 100.0) - 100.0,
-        2
-    )
+    return ((sl_price / average_price) * 100.0) - 100.0
+
+
+def calculate_sl_values(
+        average_price, base_price, initial_sl_percentage, activation_diff,
+        sl_increment_factor, is_short
+    ):
+    """Calculate the SL price and the SL percentages for that price"""
+
+    # Calculate the amount we need to substract or add to the average price based
+    # on the configured increments and activation
+    percentageprice = average_price * ((initial_sl_percentage / 100.0)
+                                        + ((activation_diff / 100.0) * sl_increment_factor))
+
+    # Now we know the SL price, let's calculate the percentage from
+    # the base order price so we have the desired SL for 3C. And also
+    # the readable percentage for the user (on the TP axis)
+    if is_short:
+        slprice = average_price - percentageprice
+        basepriceslpercentage = calculate_slpercentage_base_price_short(
+                slprice, base_price
+            )
+        understandableslpercentage = calculate_average_price_sl_percentage_short(
+                slprice, average_price
+            )
+    else:
+        slprice = average_price + percentageprice
+        basepriceslpercentage = calculate_slpercentage_base_price_long(
+                slprice, base_price
+            )
+        understandableslpercentage = calculate_average_price_sl_percentage_long(
+                slprice, average_price
+            )
+
+    return slprice, basepriceslpercentage, understandableslpercentage
 
 
 def calculate_sl_percentage(logger, deal_data, config, activation_diff):
@@ -92,66 +150,44 @@ def calculate_sl_percentage(logger, deal_data, config, activation_diff):
     currentslpercentage = (
         float(deal_data["stop_loss_percentage"]) if deal_data["stop_loss_percentage"] else 0.0
     )
-    initialstoplosspercentage = float(config.get("initial-stoploss-percentage"))
-    slincrementfactor = float(config.get("sl-increment-factor"))
+    initialstoplosspercentage = config.get("initial-stoploss-percentage")
+    slincrementfactor = config.get("sl-increment-factor")
 
     # If there is no SL configured for this config, return default values
     if initialstoplosspercentage == 0.0:
         return currentslpercentage, 0.0, 0.0, 0.0
 
+    isshort = deal_data["strategy"] == "short"
+
     # SL is calculated by 3C on base order price. Because of filled SO's,
     # we must first calculate the SL price based on the average price
-    averageprice = 0.0
-    if deal_data["strategy"] == "short":
-        averageprice = float(deal_data["sold_average_price"])
-    else:
-        averageprice = float(deal_data["bought_average_price"])
-
-    # Calculate the amount we need to substract or add to the average price based
-    # on the configured increments and activation
-    percentageprice = averageprice * ((initialstoplosspercentage / 100.0)
-                                        + ((activation_diff / 100.0) * slincrementfactor))
-
-    slprice = averageprice
-    if deal_data["strategy"] == "short":
-        slprice -= percentageprice
-    else:
-        slprice += percentageprice
+    averageprice = float(
+        deal_data["sold_average_price" if isshort else "bought_average_price"]
+    )
+    baseprice = float(deal_data["base_order_average_price"])
 
-    logger.debug(
-        f"{deal_data['pair']}/{deal_data['id']}: SL price {slprice} calculated based on average "
-        f"price {averageprice}, initial SL of {initialstoplosspercentage}, "
-        f"activation diff of {activation_diff} and sl factor {slincrementfactor}"
+    slprice, basepriceslpercentage, understandableslpercentage = calculate_sl_values(
+        averageprice, baseprice, initialstoplosspercentage, activation_diff,
+        slincrementfactor, isshort
     )
 
-    # Now we know the SL price, let's calculate the percentage from
-    # the base order price so we have the desired SL for 3C
-    baseprice = float(deal_data["base_order_average_price"])
-    basepriceslpercentage = 0.0
-    # And also the readable percentage for the user (on the TP axis)
-    understandableslpercentage = 0.0
+    # The percentages are compared with and sent to 3C, which uses two decimals
+    basepriceslpercentage = round(basepriceslpercentage, 2)
+    understandableslpercentage = round(understandableslpercentage, 2)
 
-    if deal_data["strategy"] == "short":
-        basepriceslpercentage = calculate_slpercentage_base_price_short(
-                slprice, baseprice
-            )
-        understandableslpercentage = calculate_average_price_sl_percentage_short(
-                slprice, averageprice
-            )
-    else:
-        basepriceslpercentage = calculate_slpercentage_base_price_long(
-                slprice, baseprice
-            )
-        understandableslpercentage = calculate_average_price_sl_percentage_long(
-                slprice, averageprice
-            )
+    if logger.is_debug_enabled():
+        logger.debug(
+            f"{deal_data['pair']}/{deal_data['id']}: SL price {slprice} calculated based on "
+            f"average price {averageprice}, initial SL of {initialstoplosspercentage}, "
+            f"activation diff of {activation_diff} and sl factor {slincrementfactor}"
+        )
 
-    logger.debug(
-        f"{deal_data['pair']}/{deal_data['id']}: "
-        f"3C SL of {basepriceslpercentage}% calculated (which is "
-        f"{understandableslpercentage}% for understandig) based "
-        f"on base price {baseprice} and SL price {slprice}."
-    )
+        logger.debug(
+            f"{deal_data['pair']}/{deal_data['id']}: "
+            f"3C SL of {basepriceslpercentage}% calculated (which is "
+            f"{understandableslpercentage}% for understandig) based "
+            f"on base price {baseprice} and SL price {slprice}."
+        )
 
     return currentslpercentage, basepriceslpercentage, understandableslpercentage
 
@@ -162,12 +198,13 @@ def calculate_tp_percentage(logger, deal_data, config, activation_diff, last_pro
     # Closing strategy means 3C will monitor the condition and manage the TP
     if len(deal_data["close_strategy_list"]) > 0:
         minprofitpercentage = float(deal_data["min_profit_percentage"])
-        logger.info(
-            f"Deal data: {deal_data}. "
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"Deal data: {deal_data}. "
+            )
         return minprofitpercentage, minprofitpercentage
 
-    tpincrementfactor = float(config.get("tp-increment-factor"))
+    tpincrementfactor = config.get("tp-increment-factor")
 
     currenttppercentage = float(deal_data["take_profit"])
     if tpincrementfactor <= 0.0:
@@ -182,123 +219,125 @@ def calculate_tp_percentage(logger, deal_data, config, activation_diff, last_pro
                 * tpincrementfactor
             ), 2
         )
-        logger.debug(
-            f"{deal_data['pair']}/{deal_data['id']}: "
-            f"Updated TP to {newtppercentage}% calculated based on current profit of "
-            f"{currenttppercentage}%, new profit of {deal_data['actual_profit_percentage']}%, "
-            f"last profit of {last_profit_percentage}% and factor {tpincrementfactor}."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"{deal_data['pair']}/{deal_data['id']}: "
+                f"Updated TP to {newtppercentage}% calculated based on current profit of "
+                f"{currenttppercentage}%, new profit of {deal_data['actual_profit_percentage']}%, "
+                f"last profit of {last_profit_percentage}% and factor {tpincrementfactor}."
+            )
     else:
         newtppercentage = round(
             currenttppercentage + (activation_diff * tpincrementfactor), 2
         )
 
-        logger.debug(
-            f"{deal_data['pair']}/{deal_data['id']}: "
-            f"Initial TP of {newtppercentage}% calculated based on last profit of "
-            f"{last_profit_percentage}% and current {currenttppercentage}%, "
-            f"using activation_diff {activation_diff}% and factor {tpincrementfactor}."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"{deal_data['pair']}/{deal_data['id']}: "
+                f"Initial TP of {newtppercentage}% calculated based on last profit of "
+                f"{last_profit_percentage}% and current {currenttppercentage}%, "
+                f"using activation_diff {activation_diff}% and factor {tpincrementfactor}."
+            )
 
     return currenttppercentage, newtppercentage
 
 
-# # TODO: optimize and improve readability of this function
-def calculate_safety_order(logger, bot_data, deal_data, filled_so_count, current_profit):
-    """Calculate the next safety order."""
+def calculate_geometric_sum(first_value, factor, count):
+    """Calculate the sum of the first count values of a geometric series"""
 
-    # Number of SO to buy
-    sobuycount = 0
+    if factor == 1.0:
+        return first_value * count
 
-    # Volume to buy
-    sobuyvolume = 0.0
+    return first_value * (1.0 - factor ** count) / (1.0 - factor)
 
-    # Price to buy the volume on
-    sobuyprice = 0.0
 
-    # Percentage for next SO to monitor the deal on
-    sonextdroppercentage = 0.0
+def calculate_safety_order_level(step_percentage, step_coefficient, max_safety_orders, current_profit):
+    """Calculate the number of Safety Orders of which the total drop is within the current profit"""
 
-    # Default values for calculationloop below
-    sovolume = totalvolume = 0.0
-    sopercentagedropfrombaseprice = totaldroppercentage = 0.0
-    sobuyprice = 0.0
+    # Small margin so a total drop equal to the (rounded) profit is not missed
+    # because of floating point rounding
+    maxdrop = current_profit + SAFETY_ORDER_DROP_MARGIN
 
-    socounter = 0
-    while socounter < deal_data['max_safety_orders']:
-        logger.debug(
-            f"{deal_data['pair']}/{deal_data['id']}: "
-            f"at SO {socounter}/{deal_data['max_safety_orders']}, "
-            f"Volume: {sovolume}/{totalvolume}, "
-            f"Drop: {sopercentagedropfrombaseprice}/{totaldroppercentage}, "
-            f"Price: {sobuyprice}."
-        )
+    # Estimate the level by solving the sum of the geometric series for the count
+    level = max_safety_orders
+    if step_percentage > 0.0:
+        if step_coefficient == 1.0:
+            level = int(maxdrop / step_percentage)
+        elif step_coefficient > 0.0:
+            remaining = 1.0 - (maxdrop * (1.0 - step_coefficient) / step_percentage)
 
-        nextsovolume = 0.0
-        nextsopercentagedropfrombaseprice = 0.0
-
-        # First SO takes the default values, following SO are multiplied with the configured factors
-        if socounter == 0:
-            nextsovolume = float(bot_data["safety_order_volume"])
-            nextsopercentagedropfrombaseprice = float(bot_data["safety_order_step_percentage"])
-        else:
-            nextsovolume = float(sovolume) * float(bot_data["martingale_volume_coefficient"])
-            nextsopercentagedropfrombaseprice = (
-                float(sopercentagedropfrombaseprice) *
-                float(bot_data["martingale_step_coefficient"])
-            )
+            # The total drop of a decreasing series is limited, and all Safety Orders
+            # are within the profit when the limit is reached
+            if remaining > 0.0:
+                level = int(math.log(remaining) / math.log(step_coefficient))
 
-        nextsototalvolume = totalvolume + nextsovolume
-        nextsopercentagetotaldrop = totaldroppercentage + nextsopercentagedropfrombaseprice
-        nextsobuyprice = (
-            float(deal_data["base_order_average_price"]) *
-            ((100.0 - nextsopercentagetotaldrop) / 100.0)
-        )
+    level = min(max(level, 0), max_safety_orders)
 
-        # Print data for next SO
+    # Correct the estimate for rounding of the logarithms
+    while (level < max_safety_orders and
+           calculate_geometric_sum(step_percentage, step_coefficient, level + 1) <= maxdrop):
+        level += 1
+    while (level > 0 and
+           calculate_geometric_sum(step_percentage, step_coefficient, level) > maxdrop):
+        level -= 1
+
+    return level
+
+
+def calculate_safety_order(logger, bot_data, deal_data, filled_so_count, current_profit):
+    """Calculate the next safety order."""
+
+    maxsafetyorders = deal_data["max_safety_orders"]
+
+    sovolume = float(bot_data["safety_order_volume"])
+    sovolumecoefficient = float(bot_data["martingale_volume_coefficient"])
+    sostep = float(bot_data["safety_order_step_percentage"])
+    sostepcoefficient = float(bot_data["martingale_step_coefficient"])
+
+    if logger.is_debug_enabled():
         logger.debug(
-            f"{deal_data['pair']}/{deal_data['id']}: calculated next SO {socounter + 1}, "
-            f"Volume: {nextsovolume}/{nextsototalvolume}, "
-            f"Drop: {nextsopercentagedropfrombaseprice}/{nextsopercentagetotaldrop}, "
-            f"Price: {nextsobuyprice}"
+            f"{deal_data['pair']}/{deal_data['id']}: "
+            f"calculating SO for profit {current_profit} with {filled_so_count} filled SO "
+            f"of max {maxsafetyorders}, volume {sovolume} (scale {sovolumecoefficient}) "
+            f"and step {sostep} (scale {sostepcoefficient})."
         )
 
-        # Descision making :)
-        if socounter < filled_so_count:
-            logger.debug(f"SO {socounter} already filled!")
-
-            sovolume = nextsovolume
-            totalvolume = nextsototalvolume
-            sopercentagedropfrombaseprice = nextsopercentagedropfrombaseprice
-            totaldroppercentage = nextsopercentagetotaldrop
-            sobuyprice = nextsobuyprice
-        elif nextsopercentagetotaldrop <= current_profit:
-            logger.debug(
-                f"{deal_data['pair']}/{deal_data['id']}: next SO {socounter + 1} "
-                f"not filled and required based on (negative) profit."
-            )
+    # Filled Safety Orders are always part of the current level. The volume and the
+    # percentage drop of each next SO are multiplied with the configured factors,
+    # which makes both a geometric series
+    filledcount = min(filled_so_count, maxsafetyorders)
+    solevel = max(
+        calculate_safety_order_level(sostep, sostepcoefficient, maxsafetyorders, current_profit),
+        filledcount
+    )
 
-            sovolume = nextsovolume
-            totalvolume = nextsototalvolume
-            sopercentagedropfrombaseprice = nextsopercentagedropfrombaseprice
-            totaldroppercentage = nextsopercentagetotaldrop
-            sobuyprice = nextsobuyprice
+    # Number of SO to buy
+    sobuycount = solevel - filledcount
 
-            sobuycount += 1
-            sobuyvolume += nextsovolume
-        elif nextsopercentagetotaldrop > current_profit:
-            logger.debug(
-                f"{deal_data['pair']}/{deal_data['id']}: next SO {socounter + 1} "
-                f"not filled and not required! Stop at SO {socounter}"
-            )
+    # Volume to buy
+    sobuyvolume = 0.0
+    if sobuycount > 0:
+        sobuyvolume = calculate_geometric_sum(
+            sovolume * (sovolumecoefficient ** filledcount), sovolumecoefficient, sobuycount
+        )
 
-            sonextdroppercentage = nextsopercentagetotaldrop
-            break
+    # Total percentage drop and the price to buy the volume on
+    totaldroppercentage = 0.0
+    sobuyprice = 0.0
+    if solevel > 0:
+        totaldroppercentage = calculate_geometric_sum(sostep, sostepcoefficient, solevel)
+        sobuyprice = (
+            float(deal_data["base_order_average_price"]) *
+            ((100.0 - totaldroppercentage) / 100.0)
+        )
 
-        socounter += 1
+    # Percentage for next SO to monitor the deal on
+    sonextdroppercentage = 0.0
+    if solevel < maxsafetyorders:
+        sonextdroppercentage = calculate_geometric_sum(sostep, sostepcoefficient, solevel + 1)
 
     logger.info(
-        f"{deal_data['pair']}/{deal_data['id']}: SO level {socounter} reached. "
+        f"{deal_data['pair']}/{deal_data['id']}: SO level {solevel} reached. "
         f"Need to buy {sobuycount} - {sobuyvolume}/{sobuyprice}! "
         f"Next SO at {sonextdroppercentage}."
     )
@@ -312,20 +351,22 @@ def determine_price_quantity(logger, bot_data, deal_data, limit_data, calc_price
     limitprice = calc_price
     quantity = calc_quantity
 
-    if deal_data["strategy"] == "long" and calc_price > float(deal_data["current_price"]):
-        logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"current price {deal_data['current_price']} lower than "
-            f"calculated price {calc_price}, so using the current price."
-        )
-        limitprice = float(deal_data["current_price"])
-    elif deal_data["strategy"] == "short" and calc_price < float(deal_data["current_price"]):
+    # The calculated price may not be worse than the current price of the pair
+    currentprice = float(deal_data["current_price"])
+    if deal_data["strategy"] == "short":
+        usecurrentprice = calc_price < currentprice
+        pricecomparison = "higher"
+    else:
+        usecurrentprice = calc_price > currentprice
+        pricecomparison = "lower"
+
+    if usecurrentprice:
         logger.debug(
             f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"current price {deal_data['current_price']} higher than "
+            f"current price {deal_data['current_price']} {pricecomparison} than "
             f"calculated price {calc_price}, so using the current price."
         )
-        limitprice = float(deal_data["current_price"])
+        limitprice = currentprice
 
     if deal_data["safety_order_volume_type"] == "quote_currency":
         quantity = calc_quantity / limitprice
@@ -3,19 +3,19 @@
 import argparse
 import configparser
 import json
-from math import fabs
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from math import ceil
 import os
+import signal
 import sqlite3
 import sys
+import threading
 import time
 import traceback
 from pathlib import Path
 
 from helpers.logging import Logger, NotificationHandler
-from helpers.database import (
-    get_next_process_time,
-    set_next_process_time
-)
 from helpers.misc import (
     get_round_digits,
     unix_timestamp_to_string,
@@ -37,11 +37,11 @@ from helpers.trailingstoploss_tp import (
     check_float,
     determine_price_quantity,
     determine_profit_prefix,
-    get_pending_order_db_data,
+    get_bot_db_data,
     get_profit_db_data,
     get_safety_db_data,
-    is_new_deal,
     is_valid_deal,
+    prepare_section_config,
     validate_add_funds_data
 )
 
@@ -107,9 +107,86 @@ def load_config():
     return None
 
 
+def get_config_mtime():
+    """Get the modification time of the config file, or None if it's not accessible."""
+
+    try:
+        return os.stat(f"{datadir}/{program}.ini").st_mtime_ns
+    except OSError:
+        return None
+
+
+def prepare_bot_sections(cfg):
+    """Decode and check the configuration of all sections with bots to process."""
+
+    botsections = []
+    configuredbots = set()
+
+    for section in cfg.sections():
+        if section.startswith("tsl_tp_"):
+            sectionsafetymode = cfg.get(section, "safety-mode")
+
+            #TODO: add the 'shift' option in the future
+            if sectionsafetymode.lower() not in ("merge",):
+                logger.warning(
+                    f"Section {section} has an invalid \'safety-mode\'. Skipping this section!"
+                )
+                continue
+
+            # Get and check the profit-config for this section
+            try:
+                sectionprofitconfig = prepare_section_config(
+                    json.loads(cfg.get(section, "profit-config"))
+                )
+                sectionsafetyconfig = prepare_section_config(
+                    json.loads(cfg.get(section, "safety-config"))
+                )
+            except (TypeError, ValueError) as err:
+                logger.warning(
+                    f"Section {section} has an invalid value in the \'profit-config\' "
+                    f"or \'safety-config\' ({err}). Skipping this section!"
+                )
+                continue
+
+            if not sectionprofitconfig and not sectionsafetyconfig:
+                logger.warning(
+                    f"Section {section} has no \'profit-config\' and no \'safety-config\'. "
+                    f"Skipping this section!"
+                )
+                continue
+
+            # Bot configuration for section. A bot can only be handled by one
+            # section, otherwise it would be processed multiple times per cycle
+            botids = []
+            for bot in json.loads(cfg.get(section, "botids")):
+                if bot in configuredbots:
+                    logger.warning(
+                        f"Bot {bot} in section {section} has already been configured "
+                        f"before. Skipping this duplicate!"
+                    )
+                    continue
+
+                configuredbots.add(bot)
+                botids.append(bot)
+
+            botsections.append(
+                (tuple(botids), sectionprofitconfig, sectionsafetyconfig, sectionsafetymode)
+            )
+        elif section not in ("settings",):
+            logger.warning(
+                f"Section '{section}' not processed (prefix 'tsl_tp_' missing)!",
+                False
+            )
+
+    return botsections
+
+
 def upgrade_config(thelogger, cfg):
     """Upgrade config file if needed."""
 
+    # Only write the file once, after all upgrades have been applied
+    upgraded = False
+
     if len(cfg.sections()) == 1:
         # Old configuration containing only one section (settings)
         logger.error(
@@ -131,15 +208,14 @@ def upgrade_config(thelogger, cfg):
         cfg.remove_option("settings", "sl-increment-factor")
         cfg.remove_option("settings", "tp-increment-factor")
 
-        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-            cfg.write(cfgfile)
+        upgraded = True
 
         thelogger.info("Upgraded the configuration file")
 
     for cfgsection in cfg.sections():
         if cfgsection.startswith("tsl_tp_"):
             if not cfg.has_option(cfgsection, "profit-config"):
-                cfg.set(cfgsection, "profit-config", config.get(cfgsection, "config"))
+                cfg.set(cfgsection, "profit-config", cfg.get(cfgsection, "config"))
                 cfg.remove_option(cfgsection, "config")
 
                 cfgsectionsafetyconfig = list()
@@ -152,39 +228,40 @@ def upgrade_config(thelogger, cfg):
 
                 cfg.set(cfgsection, "safety-config", json.dumps(cfgsectionsafetyconfig))
 
-                with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-                    cfg.write(cfgfile)
+                upgraded = True
 
                 thelogger.info(
                     f"Upgraded section {cfgsection} to have profit- and safety- config list"
                 )
             else:
                 jsonconfiglist = list()
+                sectionupgraded = False
                 for configsectionconfig in json.loads(cfg.get(cfgsection, "profit-config")):
                     if "activation-so-count" not in configsectionconfig:
-                        cfgsectionconfig = {
-                            "activation-percentage": configsectionconfig.get("activation-percentage"),
+                        # Older entries may lack other keys as well. Those get a
+                        # default which doesn't change the SL or TP
+                        configsectionconfig = {
+                            "activation-percentage": configsectionconfig.get("activation-percentage", "0.0"),
                             "activation-so-count": "0",
-                            "initial-stoploss-percentage": configsectionconfig.get("initial-stoploss-percentage"),
-                            "sl-timeout": configsectionconfig.get("sl-timeout"),
-                            "sl-increment-factor": configsectionconfig.get("sl-increment-factor"),
-                            "tp-increment-factor": configsectionconfig.get("tp-increment-factor"),
+                            "initial-stoploss-percentage": configsectionconfig.get("initial-stoploss-percentage", "0.0"),
+                            "sl-timeout": configsectionconfig.get("sl-timeout", "0"),
+                            "sl-increment-factor": configsectionconfig.get("sl-increment-factor", "0.0"),
+                            "tp-increment-factor": configsectionconfig.get("tp-increment-factor", "0.0"),
                         }
-                        jsonconfiglist.append(cfgsectionconfig)
+                        sectionupgraded = True
+                    jsonconfiglist.append(configsectionconfig)
 
-                if len(jsonconfiglist) > 0:
-                    cfg.set(cfgsection, "config", json.dumps(jsonconfiglist))
+                if sectionupgraded:
+                    cfg.set(cfgsection, "profit-config", json.dumps(jsonconfiglist))
 
-                    with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-                        cfg.write(cfgfile)
+                    upgraded = True
 
                     thelogger.info(f"Updates section {cfgsection} to add activation-so-count")
 
             if not cfg.has_option(cfgsection, "safety-mode"):
                 cfg.set(cfgsection, "safety-mode", "merge")
 
-                with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-                    cfg.write(cfgfile)
+                upgraded = True
 
                 thelogger.info(f"Updates section {cfgsection} to add safety-mode")
 
@@ -192,27 +269,28 @@ def upgrade_config(thelogger, cfg):
         cfg.set("settings", "notify-trailing-update", "True")
         cfg.set("settings", "notify-trailing-reset", "True")
 
-        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-            cfg.write(cfgfile)
+        upgraded = True
 
         thelogger.info("Updates settings to add notify options")
 
     if not cfg.has_option("settings", "notify-trailing-start"):
         cfg.set("settings", "notify-trailing-start", "True")
 
-        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
-            cfg.write(cfgfile)
+        upgraded = True
 
         thelogger.info("Updates settings to add notify options")
 
     if not cfg.has_option("settings", "3c-apikey-path"):
         cfg.set("settings", "3c-apikey-path", "")
 
-        with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
-            cfg.write(cfgfile)
+        upgraded = True
 
         logger.info("Upgraded the configuration file (3c-apikey-path)")
 
+    if upgraded:
+        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
+            cfg.write(cfgfile)
+
     return cfg
 
 
@@ -230,13 +308,6 @@ def update_deal_profit(bot_data, deal_data, new_stoploss, new_take_profit, sl_ti
 
     # Only update TP values when no conditional take profit is used
     # Note: currently the API does not support this. Script cannot be used for MP deals yet!
-    #if not len(thebot['close_strategy_list']):
-    #if deal_data["status"].lower() not in("close_strategy_activated"):
-    #    payload["take_profit"] = new_take_profit
-    #    payload["trailing_enabled"] = False
-    #else:
-    #    payload["take_profit"] = 0.05
-    #    payload["trailing_enabled"] = False
     if len(deal_data["close_strategy_list"]) == 0:
         payload["take_profit"] = new_take_profit
 
@@ -296,8 +367,8 @@ def get_settings(section_config: dict, current_profit: float, current_so_level:
     settings = {}
 
     for entry in section_config:
-        if (current_profit >= float(entry["activation-percentage"]) and
-            current_so_level >= int(entry["activation-so-count"])):
+        if (current_profit >= entry["activation-percentage"] and
+            current_so_level >= entry["activation-so-count"]):
             settings = entry
 
     return settings
@@ -312,21 +383,35 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
     deals = bot_data["active_deals"]
 
     if not deals:
-        logger.debug(
-            f"Bot \"{bot_data['name']}\" ({botid}) has no active deals."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"Bot \"{bot_data['name']}\" ({botid}) has no active deals."
+            )
         remove_all_deals(botid)
 
         return 0
 
     currentdeals = []
+    checkeddeals = set()
+
+    # Fetch the stored data of all deals of this bot at once
+    profitdbdata = get_bot_db_data(cursor, "deal_profit", botid)
+    safetydbdata = get_bot_db_data(cursor, "deal_safety", botid)
+    orderdbdata = get_bot_db_data(cursor, "pending_orders", botid)
 
     for deal in deals:
+        # The stored deal data is fetched only once, so a deal listed more
+        # than once must also be processed only once
+        if deal["id"] in checkeddeals:
+            continue
+        checkeddeals.add(deal["id"])
+
         # Check whether we can handle the deal based on the strategy
-        if deal["strategy"] not in ("short", "long"):
+        strategy = deal["strategy"]
+        if strategy not in ("short", "long"):
             logger.warning(
                 f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']}: "
-                f"Unknown strategy {deal['strategy']}!"
+                f"Unknown strategy {strategy}!"
             )
             continue
 
@@ -343,7 +428,6 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
         # means not all data is available for further calculations. Failed,
         # cancelled, completed and panic_sell_pending are states in which we
         # don't need to do anything or should not interfere with.
-        #if deal["status"].lower() not in("bought", "close_strategy_activated"):
         if deal["status"].lower() not in("bought", "close_strategy_activated"):
             logger.info(
                 f"\"{bot_data['name']}\": {deal['pair']}/{deal['id']} has status "
@@ -352,12 +436,16 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
             continue
 
         processdeal = True
-        if is_new_deal(cursor, deal["id"]):
+        if deal["id"] not in profitdbdata:
             if is_valid_deal(logger, bot_data, deal, section_safety_config):
                 add_deal_in_db(deal["id"], botid)
 
                 # Calculate the percentage for the first Safety Order
                 set_first_safety_order(bot_data, deal, 0, 0.0)
+
+                # Fetch the data just stored for this new deal
+                profitdbdata[deal["id"]] = get_profit_db_data(cursor, deal["id"])
+                safetydbdata[deal["id"]] = get_safety_db_data(cursor, deal["id"])
             else:
                 # No valid deal (yet), so don't process it for now
                 processdeal = False
@@ -365,111 +453,110 @@ def process_deals(bot_data, section_profit_config, section_safety_config, sectio
         if processdeal:
             currentdeals.append(deal["id"])
 
-            if float(deal["actual_profit_percentage"]) > 0.0 and len(section_profit_config) > 0:
+            actualprofitpercentage = float(deal["actual_profit_percentage"])
+            if actualprofitpercentage > 0.0 and len(section_profit_config) > 0:
                 monitoreddeals += process_deal_for_profit(
-                    section_profit_config, bot_data, deal
+                    section_profit_config, bot_data, deal, profitdbdata.get(deal["id"])
                 )
-            elif float(deal["actual_profit_percentage"]) < 0.0 and len(section_safety_config) > 0:
+            elif actualprofitpercentage < 0.0 and len(section_safety_config) > 0:
                 monitoreddeals += process_deal_for_safety_order(
-                    section_safety_config, section_safety_mode, bot_data, deal
+                    section_safety_config, section_safety_mode, bot_data, deal,
+                    safetydbdata.get(deal["id"]), orderdbdata.get(deal["id"])
                 )
 
     # Housekeeping, clean things up and prevent endless growing database
     remove_closed_deals(botid, currentdeals)
 
-    logger.debug(
-        f"Bot \"{bot_data['name']}\" ({botid}) has {len(deals)} deal(s) "
-        f"of which {monitoreddeals} require monitoring."
-    )
+    if logger.is_debug_enabled():
+        logger.debug(
+            f"Bot \"{bot_data['name']}\" ({botid}) has {len(deals)} deal(s) "
+            f"of which {monitoreddeals} require monitoring."
+        )
 
     return monitoreddeals
 
 
-def process_deal_for_profit(section_profit_config, bot_data, deal_data):
+def process_deal_for_profit(section_profit_config, bot_data, deal_data, deal_db_data):
     """Process a deal which has positive profit"""
 
+    actualprofitpercentage = float(deal_data["actual_profit_percentage"])
+
     # Don't process the deal further when the current profit exceeds the configured TP
     if (len(deal_data["close_strategy_list"]) == 0 and
-        float(deal_data["actual_profit_percentage"]) >= float(deal_data["take_profit"])
+        actualprofitpercentage >= float(deal_data["take_profit"])
     ):
-        logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"current profit {deal_data['actual_profit_percentage']} equal or above "
-            f"take profit of {deal_data['take_profit']}, so there is no point in "
-            f"updating TP and/or SL value. Deal will be closed by 3Commas."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+                f"current profit {deal_data['actual_profit_percentage']} equal or above "
+                f"take profit of {deal_data['take_profit']}, so there is no point in "
+                f"updating TP and/or SL value. Deal will be closed by 3Commas."
+            )
         return 0 #Deal does not require monitoring
 
-    requiremonitoring = 0
-
     # Deal is in positive profit, so TSL mode which requires the profit-config
-    dealdbdata = get_profit_db_data(cursor, deal_data["id"])
-
     profitconfig = get_settings(
         section_profit_config,
-        float(deal_data["actual_profit_percentage"]),
+        actualprofitpercentage,
         int(deal_data["completed_safety_orders_count"])
     )
 
-    requiremonitoring = handle_deal_profit(
-            bot_data, deal_data, dealdbdata, profitconfig
-        )
+    return handle_deal_profit(bot_data, deal_data, deal_db_data, profitconfig)
 
-    return requiremonitoring
 
-
-def process_deal_for_safety_order(section_safety_config, section_safety_mode, bot_data, deal_data):
+def process_deal_for_safety_order(
+        section_safety_config, section_safety_mode, bot_data, deal_data,
+        deal_db_data, order_db_data
+    ):
     """Process a deal which has negative profit"""
 
     # SO mode requires the total % drop without filled safety oders
-    totalprofit = round(fabs(
+    totalprofit = round(abs(
         ((float(deal_data["current_price"]) /
         float(deal_data["base_order_average_price"])) * 100.0) - 100.0
     ), 2)
 
-    # Fetch data from local DB for this deal
-    dealdbdata = get_safety_db_data(cursor, deal_data["id"])
-    orderdbdata = get_pending_order_db_data(cursor, deal_data["id"])
-
     # Evaluate returns two values:
     # 0: True if the deal requires monitoring, in which case this function can return directly
     # 1: True if the DB data has been changed, and the local data must be updated
-    result = evaluate_deal_orders(bot_data, deal_data, dealdbdata, orderdbdata, totalprofit)
+    result = evaluate_deal_orders(bot_data, deal_data, deal_db_data, order_db_data, totalprofit)
     if result[0]:
         return 1
     if result[1]:
-        dealdbdata = get_safety_db_data(cursor, deal_data["id"])
+        deal_db_data = get_safety_db_data(cursor, deal_data["id"])
 
-    if dealdbdata['filled_so_count'] == deal_data['max_safety_orders']:
-        logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
-            f"has filled all {deal_data['max_safety_orders']} Safety Orders."
-        )
+    if deal_db_data['filled_so_count'] == deal_data['max_safety_orders']:
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
+                f"has filled all {deal_data['max_safety_orders']} Safety Orders."
+            )
         return 0 #Deal does not require monitoring
 
     # Return value for this function
     requiremonitoring = 0
 
     # We use the relative profit to the next SO for determining if further processing is required
-    sorelativeprofit = round(totalprofit - dealdbdata["next_so_percentage"], 2)
+    sorelativeprofit = round(totalprofit - deal_db_data["next_so_percentage"], 2)
     if sorelativeprofit >= 0.0:
         safetyconfig = get_settings(
-                section_safety_config, sorelativeprofit, dealdbdata["filled_so_count"]
+                section_safety_config, sorelativeprofit, deal_db_data["filled_so_count"]
             )
 
         if safetyconfig:
             requiremonitoring = handle_deal_safety(
-                        bot_data, deal_data, dealdbdata, safetyconfig, totalprofit
+                        bot_data, deal_data, deal_db_data, safetyconfig, totalprofit
                     )
         else:
-            logger.debug(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-                f"no safety config available for profit -{sorelativeprofit}% "
-                f"and {dealdbdata['filled_so_count']} filled SO."
-            )
+            if logger.is_debug_enabled():
+                logger.debug(
+                    f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+                    f"no safety config available for profit -{sorelativeprofit}% "
+                    f"and {deal_db_data['filled_so_count']} filled SO."
+                )
 
-            if (dealdbdata["last_profit_percentage"] != 0.0 or
-                dealdbdata["add_funds_percentage"] != dealdbdata["next_so_percentage"]
+            if (deal_db_data["last_profit_percentage"] != 0.0 or
+                deal_db_data["add_funds_percentage"] != deal_db_data["next_so_percentage"]
             ):
                 logger.info(
                     f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
@@ -478,25 +565,26 @@ def process_deal_for_safety_order(section_safety_config, section_safety_mode, bo
                     notifytrailingreset
                 )
                 update_safetyorder_monitor_in_db(
-                    deal_data["id"], 0.0, dealdbdata['next_so_percentage']
+                    deal_data["id"], 0.0, deal_db_data['next_so_percentage']
                 )
     else:
-        logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
-            f"requires {fabs(sorelativeprofit)}% change before next SO "
-            f"at {dealdbdata['next_so_percentage']:0.2f}% will be reached."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
+                f"requires {abs(sorelativeprofit)}% change before next SO "
+                f"at {deal_db_data['next_so_percentage']:0.2f}% will be reached."
+            )
 
-        if (dealdbdata["last_profit_percentage"] != 0.0 or
-            dealdbdata["add_funds_percentage"] != dealdbdata["next_so_percentage"]
+        if (deal_db_data["last_profit_percentage"] != 0.0 or
+            deal_db_data["add_funds_percentage"] != deal_db_data["next_so_percentage"]
         ):
             logger.info(
                 f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
                 f"trailing reset because profit suddenly changed and went above "
-                f"the SO at {dealdbdata['next_so_percentage']:0.2f}%.",
+                f"the SO at {deal_db_data['next_so_percentage']:0.2f}%.",
                 notifytrailingreset
             )
-            update_safetyorder_monitor_in_db(deal_data["id"], 0.0, dealdbdata['next_so_percentage'])
+            update_safetyorder_monitor_in_db(deal_data["id"], 0.0, deal_db_data['next_so_percentage'])
 
     return requiremonitoring
 
@@ -517,7 +605,7 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
         )
 
         activationdiff = (
-            currentprofitpercentage - float(profit_config.get("activation-percentage"))
+            currentprofitpercentage - profit_config.get("activation-percentage")
         )
 
         # SL data contains three values:
@@ -535,8 +623,8 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
 
         sendnotification = notifytrailingupdate
 
-        newsltimeout = int(profit_config.get("sl-timeout"))
-        if (fabs(sldata[1]) > 0.0 and sldata[1] != sldata[0]):
+        newsltimeout = profit_config.get("sl-timeout")
+        if (abs(sldata[1]) > 0.0 and sldata[1] != sldata[0]):
             if lastreadableslpercentage != sldata[2]:
                 message += (
                     f"StopLoss increased from {lastreadableslpercentage}% "
@@ -563,7 +651,7 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
         # is already sold. Meaning the limit order filled on the exchange,
         # and I suspect changing the TP afterwards results in an error. Can
         # we prevent changing the TP?
-        if fabs(tpdata[0] - currentprofitpercentage) <= 0.15:
+        if abs(tpdata[0] - currentprofitpercentage) <= 0.15 and logger.is_debug_enabled():
             logger.debug(
                 f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
                 f"profit close to take profit. Deal data: {deal_data}."
@@ -621,7 +709,7 @@ def handle_deal_profit(bot_data, deal_data, deal_db_data, profit_config):
                     f"has been reset and TP restored to {bot_data['take_profit']}%.",
                     notifytrailingreset
                 )
-        else:
+        elif logger.is_debug_enabled():
             logger.debug(
                 f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
                 f"no profit increase (current: {currentprofitpercentage}%, "
@@ -663,7 +751,7 @@ def evaluate_mp_stoploss(bot_data, deal_data, current_profit_percentage, last_re
             )
 
             update_profit_in_db(deal_data['id'], 0.0, 0.0, 0.0)
-    else:
+    elif logger.is_debug_enabled():
         logger.debug(
             f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
             f"current profit {current_profit_percentage}% still higher than "
@@ -682,13 +770,14 @@ def evaluate_deal_orders(bot_data, deal_data, deal_db_data, order_db_data, total
         if deal_data['active_manual_safety_orders'] > 0:
             if total_profit >= order_db_data["cancel_at_percentage"]:
                 # Deal requires monitoring as there is a pending order
-                logger.debug(
-                    f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
-                    f"has pending Safety Order. "
-                    f"Current profit {total_profit}% has not reached cancel at "
-                    f"{order_db_data['cancel_at_percentage']}%. "
-                    f"Wait for it to fill, before handling next Safety Order."
-                )
+                if logger.is_debug_enabled():
+                    logger.debug(
+                        f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']} "
+                        f"has pending Safety Order. "
+                        f"Current profit {total_profit}% has not reached cancel at "
+                        f"{order_db_data['cancel_at_percentage']}%. "
+                        f"Wait for it to fill, before handling next Safety Order."
+                    )
                 return requiremonitoring, refreshdealdbdata
 
             # Profit has passed the SO boundary, time to cancel the pending order
@@ -772,202 +861,235 @@ def evaluate_deal_orders(bot_data, deal_data, deal_db_data, order_db_data, total
     return requiremonitoring, refreshdealdbdata
 
 
+@contextmanager
+def db_transaction():
+    """Group all database changes within a single transaction (and commit)."""
+
+    db.execute("BEGIN")
+    try:
+        yield
+    finally:
+        # Always commit, also on errors. The stored data reflects the actions
+        # already performed on 3Commas, and must not get lost
+        if db.in_transaction:
+            db.execute("COMMIT")
+
+
+def fetch_bots_data(bot_ids):
+    """Fetch the data of the bots from 3Commas, with the requests running concurrently."""
+
+    # Only the requests run in parallel, processing of the data (and the
+    # database) remains on the main thread
+    botrequests = [
+        botrequestpool.submit(
+            api.request,
+            entity="bots",
+            action="show",
+            action_id=str(bot),
+        )
+        for bot in bot_ids
+    ]
+
+    # Results are returned in the same order as the bots
+    return [request.result() for request in botrequests]
+
+
 def remove_closed_deals(bot_id, current_deals):
     """Remove all deals for the given bot, except the ones in the list."""
 
     if current_deals:
-        # Remove start and end square bracket so we can properly use it
-        current_deals_str = str(current_deals)[1:-1]
+        if logger.is_debug_enabled():
+            logger.debug(f"Deleting old deals from bot {bot_id} except {current_deals}")
+
+        # One placeholder for each deal, so the values can be passed as parameters
+        placeholders = ", ".join("?" * len(current_deals))
+        parameters = (bot_id, *current_deals)
 
-        logger.debug(f"Deleting old deals from bot {bot_id} except {current_deals_str}")
         db.execute(
-            f"DELETE FROM deal_profit WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
+            "DELETE FROM deal_profit WHERE botid = ? "
+            f"AND dealid NOT IN ({placeholders})",
+            parameters
         )
         db.execute(
-            f"DELETE FROM deal_safety WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
+            "DELETE FROM deal_safety WHERE botid = ? "
+            f"AND dealid NOT IN ({placeholders})",
+            parameters
         )
         db.execute(
-            f"DELETE FROM pending_orders WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
+            "DELETE FROM pending_orders WHERE botid = ? "
+            f"AND dealid NOT IN ({placeholders})",
+            parameters
         )
 
-        db.commit()
-
 
 def remove_all_deals(bot_id):
     """Remove all stored deals for the specified bot."""
 
-    logger.debug(
-        f"Removing all stored deals for bot {bot_id}."
-    )
+    if logger.is_debug_enabled():
+        logger.debug(
+            f"Removing all stored deals for bot {bot_id}."
+        )
 
     db.execute(
-        f"DELETE FROM deal_profit WHERE botid = {bot_id}"
+        "DELETE FROM deal_profit WHERE botid = ?", (bot_id,)
     )
     db.execute(
-        f"DELETE FROM deal_safety WHERE botid = {bot_id}"
+        "DELETE FROM deal_safety WHERE botid = ?", (bot_id,)
     )
     db.execute(
-        f"DELETE FROM pending_orders WHERE botid = {bot_id}"
+        "DELETE FROM pending_orders WHERE botid = ?", (bot_id,)
     )
 
-    db.commit()
+
+def load_bot_next_process_times(max_interval):
+    """Load the next processing time of all bots stored in the database."""
+
+    # Stored times are on the wall clock, and are converted to the monotonic
+    # clock used for scheduling. Times too far ahead (clock has been changed
+    # somehow) are limited to the maximum interval
+    monotonicnow = time.monotonic()
+    offset = monotonicnow - time.time()
+
+    return {
+        dbrow["botid"]: min(
+            dbrow["next_processing_timestamp"] + offset, monotonicnow + max_interval
+        )
+        for dbrow in cursor.execute("SELECT botid, next_processing_timestamp FROM bots")
+    }
 
 
 def get_bot_next_process_time(bot_id):
-    """Get the next processing time for the specified bot."""
+    """Get the next processing time (monotonic clock) for the specified bot."""
 
-    dbrow = cursor.execute(
-            f"SELECT next_processing_timestamp FROM bots WHERE botid = {bot_id}"
-        ).fetchone()
+    # Bots without a stored time have never been processed, and are due directly
+    return botnextprocesstimes.get(bot_id, 0.0)
 
-    nexttime = int(time.time())
-    if dbrow is not None:
-        nexttime = dbrow["next_processing_timestamp"]
-    else:
-        # Record missing, create one
-        set_bot_next_process_time(bot_id, nexttime)
 
-    return nexttime
+def set_bot_next_process_time(bot_id, new_time, new_monotonic_time):
+    """Set the next processing time (wall and monotonic clock) for the specified bot."""
 
+    if logger.is_debug_enabled():
+        logger.debug(
+            f"Next processing for bot {bot_id} not before "
+            f"{unix_timestamp_to_string(new_time, '%Y-%m-%d %H:%M:%S')}."
+        )
 
-def set_bot_next_process_time(bot_id, new_time):
-    """Set the next processing time for the specified bot."""
+    botnextprocesstimes[bot_id] = new_monotonic_time
+    changedbotprocesstimes[bot_id] = new_time
 
-    logger.debug(
-        f"Next processing for bot {bot_id} not before "
-        f"{unix_timestamp_to_string(new_time, '%Y-%m-%d %H:%M:%S')}."
-    )
 
-    db.execute(
-        f"REPLACE INTO bots (botid, next_processing_timestamp) "
-        f"VALUES ({bot_id}, {new_time})"
-    )
+def store_bot_next_process_times():
+    """Store the changed next processing times of the bots in the database."""
 
-    db.commit()
+    if changedbotprocesstimes:
+        with db_transaction():
+            db.executemany(
+                "REPLACE INTO bots (botid, next_processing_timestamp) "
+                "VALUES (?, ?)",
+                changedbotprocesstimes.items()
+            )
+
+        changedbotprocesstimes.clear()
 
 
 def add_deal_in_db(deal_id, bot_id):
     """Add default data for deal (short or long) to database."""
 
     db.execute(
-        f"INSERT INTO deal_profit ("
-        f"dealid, "
-        f"botid, "
-        f"last_profit_percentage, "
-        f"last_readable_sl_percentage, "
-        f"last_readable_tp_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, {0.0}, {0.0}, {0.0}"
-        f")"
+        "INSERT INTO deal_profit ("
+        "dealid, "
+        "botid, "
+        "last_profit_percentage, "
+        "last_readable_sl_percentage, "
+        "last_readable_tp_percentage "
+        ") VALUES (?, ?, ?, ?, ?)",
+        (deal_id, bot_id, 0.0, 0.0, 0.0)
     )
     db.execute(
-        f"INSERT INTO deal_safety ("
-        f"dealid, "
-        f"botid, "
-        f"last_profit_percentage, "
-        f"add_funds_percentage, "
-        f"next_so_percentage, "
-        f"filled_so_count, "
-        f"shift_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, {0.0}, {0.0}, {0.0}, {0}, {0.0}"
-        f")"
+        "INSERT INTO deal_safety ("
+        "dealid, "
+        "botid, "
+        "last_profit_percentage, "
+        "add_funds_percentage, "
+        "next_so_percentage, "
+        "filled_so_count, "
+        "shift_percentage "
+        ") VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (deal_id, bot_id, 0.0, 0.0, 0.0, 0, 0.0)
     )
 
     logger.debug(
         f"Added deal {deal_id} on bot {bot_id} as new deal to db."
     )
 
-    db.commit()
-
 
 def update_profit_in_db(deal_id, tp_percentage, readable_sl_percentage, readable_tp_percentage):
     """Update deal profit related fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_profit SET "
-        f"last_profit_percentage = {tp_percentage}, "
-        f"last_readable_sl_percentage = {readable_sl_percentage}, "
-        f"last_readable_tp_percentage = {readable_tp_percentage} "
-        f"WHERE dealid = {deal_id}"
+        "UPDATE deal_profit SET "
+        "last_profit_percentage = ?, "
+        "last_readable_sl_percentage = ?, "
+        "last_readable_tp_percentage = ? "
+        "WHERE dealid = ?",
+        (tp_percentage, readable_sl_percentage, readable_tp_percentage, deal_id)
     )
 
-    db.commit()
-
 
 def update_safetyorder_in_db(deal_id, filled_so_count, next_so_percentage, shift_percentage):
     """Update deal safety related fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_safety SET "
-        f"next_so_percentage = {next_so_percentage}, "
-        f"filled_so_count = {filled_so_count}, "
-        f"shift_percentage = {shift_percentage} "
-        f"WHERE dealid = {deal_id}"
+        "UPDATE deal_safety SET "
+        "next_so_percentage = ?, "
+        "filled_so_count = ?, "
+        "shift_percentage = ? "
+        "WHERE dealid = ?",
+        (next_so_percentage, filled_so_count, shift_percentage, deal_id)
     )
 
-    db.commit()
-
 
 def update_safetyorder_monitor_in_db(deal_id, last_profit_percentage, add_funds_percentage):
     """Update deal safety monitor fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_safety SET "
-        f"last_profit_percentage = {last_profit_percentage}, "
-        f"add_funds_percentage = {add_funds_percentage} "
-        f"WHERE dealid = {deal_id}"
+        "UPDATE deal_safety SET "
+        "last_profit_percentage = ?, "
+        "add_funds_percentage = ? "
+        "WHERE dealid = ?",
+        (last_profit_percentage, add_funds_percentage, deal_id)
     )
 
-    db.commit()
-
 
 def add_pending_order_in_db(deal_id, bot_id, active_order_id, cancel_at_percentage, number_of_so, next_so_percentage, shift_percentage):
     """Add deal safety order (short or long) in database."""
 
     db.execute(
-        f"INSERT INTO pending_orders ("
-        f"dealid, "
-        f"botid, "
-        f"order_id, "
-        f"cancel_at_percentage, "
-        f"number_of_so, "
-        f"next_so_percentage, "
-        f"shift_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, '{active_order_id}', {cancel_at_percentage}, {number_of_so}, {next_so_percentage}, {shift_percentage}"
-        f")"
-    )
-
-    db.commit()
-
-
-def update_pending_order_in_db(deal_id, old_order_id, new_order_id):
-    """Update the id of the current open active order"""
-
-    db.execute(
-        f"UPDATE pending_orders SET "
-        f"order_id = '{new_order_id}' "
-        f"WHERE dealid = {deal_id} "
-        f"AND order_id = '{old_order_id}'"
+        "INSERT INTO pending_orders ("
+        "dealid, "
+        "botid, "
+        "order_id, "
+        "cancel_at_percentage, "
+        "number_of_so, "
+        "next_so_percentage, "
+        "shift_percentage "
+        ") VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            deal_id, bot_id, str(active_order_id), cancel_at_percentage,
+            number_of_so, next_so_percentage, shift_percentage
+        )
     )
 
-    db.commit()
-
 
 def remove_pending_order_from_db(deal_id, order_id):
     """Remove deal safety order (short or long) from database."""
 
     db.execute(
-        f"DELETE FROM pending_orders WHERE dealid = {deal_id} "
-        f"AND order_id = '{order_id}'"
+        "DELETE FROM pending_orders WHERE dealid = ? "
+        "AND order_id = ?",
+        (deal_id, str(order_id))
     )
 
-    db.commit()
-
 
 def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current_profit_percentage):
     """Handle the Safety Orders for this deal."""
@@ -979,16 +1101,16 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
     currentaddfundspercentage = deal_db_data["add_funds_percentage"]
     lastprofitpercentage = deal_db_data["last_profit_percentage"]
     if current_profit_percentage > lastprofitpercentage:
-        initialbuy = float(safety_config.get("initial-buy-percentage"))
+        initialbuy = safety_config.get("initial-buy-percentage")
 
         newaddfundspercentage = deal_db_data["next_so_percentage"] + initialbuy
         newaddfundspercentage += round(
             (current_profit_percentage - newaddfundspercentage) *
-            float(safety_config.get("buy-increment-factor")),
+            safety_config.get("buy-increment-factor"),
             2
         )
 
-        if fabs(newaddfundspercentage) > fabs(currentaddfundspercentage):
+        if abs(newaddfundspercentage) > abs(currentaddfundspercentage):
             sendnotification = (lastprofitpercentage == 0.0 and notifytrailingstart) or notifytrailingupdate
 
             # Update data in database
@@ -1012,11 +1134,12 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
         requiremonitoring = 1
     elif current_profit_percentage <= currentaddfundspercentage:
         # Current profit passed or equal to buy percentage. Add funds to the deal
-        logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"profit {profitprefix}{current_profit_percentage:0.2f}% "
-            f"passed Add Funds threshold of {profitprefix}{currentaddfundspercentage}%."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+                f"profit {profitprefix}{current_profit_percentage:0.2f}% "
+                f"passed Add Funds threshold of {profitprefix}{currentaddfundspercentage}%."
+            )
 
         # When current profit is below the desired Safety Order, reset and start from the beginning
         if current_profit_percentage < deal_db_data["next_so_percentage"]:
@@ -1043,10 +1166,11 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
                 deal_db_data["filled_so_count"], current_profit_percentage
             )
 
-            logger.debug(
-                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-                f"complete deal data is {deal_data}."
-            )
+            if logger.is_debug_enabled():
+                logger.debug(
+                    f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+                    f"complete deal data is {deal_data}."
+                )
 
             limitdata = threecommas_get_data_for_adding_funds(logger, api, deal_data)
             if limitdata:
@@ -1119,14 +1243,15 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
         # Buy percentage has not changed, but monitor frequently for changes
         requiremonitoring = 1
 
-        logger.debug(
-            f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
-            f"no profit decrease "
-            f"(current: {profitprefix}{current_profit_percentage}%, "
-            f"previous: {profitprefix}{lastprofitpercentage}%, "
-            f"Add Funds threshold: {profitprefix}{currentaddfundspercentage}%). "
-            f"Keep on monitoring."
-        )
+        if logger.is_debug_enabled():
+            logger.debug(
+                f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
+                f"no profit decrease "
+                f"(current: {profitprefix}{current_profit_percentage}%, "
+                f"previous: {profitprefix}{lastprofitpercentage}%, "
+                f"Add Funds threshold: {profitprefix}{currentaddfundspercentage}%). "
+                f"Keep on monitoring."
+            )
 
     return requiremonitoring
 
@@ -1163,13 +1288,13 @@ def open_tsl_db():
     try:
         dbname = f"{program}.sqlite3"
         dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
+        dbconnection = sqlite3.connect(dbpath, uri=True, isolation_level=None)
         dbconnection.row_factory = sqlite3.Row
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
+        dbconnection = sqlite3.connect(f"{datadir}/{dbname}", isolation_level=None)
         dbconnection.row_factory = sqlite3.Row
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
@@ -1212,70 +1337,121 @@ def open_tsl_db():
             "CREATE TABLE IF NOT EXISTS bots ("
             "botid INT Primary Key, "
             "next_processing_timestamp INT"
-            ")"
+            ") WITHOUT ROWID"
         )
 
+        # All deal tables are queried and cleaned per bot
+        for table in ("deal_profit", "deal_safety", "pending_orders"):
+            dbcursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_botid ON {table} (botid)"
+            )
+
+        # The tables are created in the latest schema, so no upgrades are needed
+        dbcursor.execute("PRAGMA user_version = 2")
+
         logger.info("Database tables created successfully")
 
+    # Write-ahead logging with normal synchronisation only requires a fsync on
+    # checkpoints instead of on every commit, and keep more pages in memory
+    dbconnection.execute("PRAGMA journal_mode=WAL")
+    dbconnection.execute("PRAGMA synchronous=NORMAL")
+    dbconnection.execute("PRAGMA cache_size=-20000")
+
+    # Read the database through memory mapping, and keep temporary data in memory
+    dbconnection.execute("PRAGMA mmap_size=134217728")
+    dbconnection.execute("PRAGMA temp_store=MEMORY")
+
     return dbconnection
 
 
 def upgrade_trailingstoploss_tp_db():
     """Upgrade database if needed."""
 
-    # Changes required for readable SL percentages
-    try:
+    # The schema version is stored in the database, so upgrades which have been
+    # applied before don't have to be tried again on every start
+    dbversion = cursor.execute("PRAGMA user_version").fetchone()[0]
+
+    if dbversion < 1:
+        # Changes required for readable SL percentages
         try:
-            # DROP column supported from sqlite 3.35.0 (2021.03.12)
-            cursor.execute("ALTER TABLE deals DROP COLUMN last_stop_loss_percentage")
+            try:
+                # DROP column supported from sqlite 3.35.0 (2021.03.12)
+                cursor.execute("ALTER TABLE deals DROP COLUMN last_stop_loss_percentage")
+            except sqlite3.OperationalError:
+                logger.debug("Older SQLite version; not used column not removed")
+
+            cursor.execute("ALTER TABLE deals ADD COLUMN last_readable_sl_percentage FLOAT DEFAULT 0.0")
+            cursor.execute("ALTER TABLE deals ADD COLUMN last_readable_tp_percentage FLOAT DEFAULT 0.0")
+
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS bots ("
+                "botid INT Primary Key, "
+                "next_processing_timestamp INT"
+                ")"
+            )
+
+            logger.info("Database schema upgraded for readable percentages")
         except sqlite3.OperationalError:
-            logger.debug("Older SQLite version; not used column not removed")
+            logger.debug("Database schema up-to-date for readable percentages")
 
-        cursor.execute("ALTER TABLE deals ADD COLUMN last_readable_sl_percentage FLOAT DEFAULT 0.0")
-        cursor.execute("ALTER TABLE deals ADD COLUMN last_readable_tp_percentage FLOAT DEFAULT 0.0")
+        # Changes required for handling Safety Orders
+        try:
+            cursor.execute("ALTER TABLE deals RENAME TO deal_profit")
+
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS deal_safety ("
+                "dealid INT Primary Key, "
+                "botid INT, "
+                "last_profit_percentage FLOAT, "
+                "add_funds_percentage FLOAT, "
+                "next_so_percentage FLOAT, "
+                "filled_so_count INT, "
+                "shift_percentage FLOAT "
+                ")"
+            )
 
-        cursor.execute(
-            "CREATE TABLE IF NOT EXISTS bots ("
-            "botid INT Primary Key, "
-            "next_processing_timestamp INT"
-            ")"
-        )
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS pending_orders ("
+                "dealid INT Primary Key, "
+                "botid INT, "
+                "order_id TEXT, "
+                "cancel_at_percentage FLOAT, "
+                "number_of_so INT, "
+                "next_so_percentage FLOAT, "
+                "shift_percentage FLOAT "
+                ")"
+            )
 
-        logger.info("Database schema upgraded for readable percentages")
-    except sqlite3.OperationalError:
-        logger.debug("Database schema up-to-date for readable percentages")
+            logger.info("Database schema upgraded for safety orders")
+        except sqlite3.OperationalError:
+            logger.debug("Database schema up-to-date for safety orders")
 
-    # Changes required for handling Safety Orders
-    try:
-        cursor.execute("ALTER TABLE deals RENAME TO deal_profit")
+        # All deal tables are queried and cleaned per bot
+        for table in ("deal_profit", "deal_safety", "pending_orders"):
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_botid ON {table} (botid)"
+            )
 
-        cursor.execute(
-            "CREATE TABLE IF NOT EXISTS deal_safety ("
-            "dealid INT Primary Key, "
-            "botid INT, "
-            "last_profit_percentage FLOAT, "
-            "add_funds_percentage FLOAT, "
-            "next_so_percentage FLOAT, "
-            "filled_so_count INT, "
-            "shift_percentage FLOAT "
-            ")"
-        )
+        db.execute("PRAGMA user_version = 1")
+        logger.info("Database schema upgraded to version 1")
 
-        cursor.execute(
-            "CREATE TABLE IF NOT EXISTS pending_orders ("
-            "dealid INT Primary Key, "
-            "botid INT, "
-            "order_id TEXT, "
-            "cancel_at_percentage FLOAT, "
-            "number_of_so INT, "
-            "next_so_percentage FLOAT, "
-            "shift_percentage FLOAT "
-            ")"
+    if dbversion < 2:
+        # Store the bots in their primary key index, instead of a separate index
+        # next to the table. The table is rebuilt in one transaction
+        cursor.executescript(
+            "BEGIN; "
+            "CREATE TABLE bots_new ("
+            "botid INT Primary Key, "
+            "next_processing_timestamp INT"
+            ") WITHOUT ROWID; "
+            "INSERT INTO bots_new (botid, next_processing_timestamp) "
+            "SELECT botid, next_processing_timestamp FROM bots WHERE botid IS NOT NULL; "
+            "DROP TABLE bots; "
+            "ALTER TABLE bots_new RENAME TO bots; "
+            "PRAGMA user_version = 2; "
+            "COMMIT;"
         )
-
-        logger.info("Database schema upgraded for safety orders")
-    except sqlite3.OperationalError:
-        logger.debug("Database schema up-to-date for safety orders")
+        logger.info("Database schema upgraded to version 2")
 
 
 # Start application
@@ -1330,11 +1506,18 @@ else:
 
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
+# Modification time of the loaded configuration file, used to detect changes
+configmtime = get_config_mtime()
+configchanged = True
+
 # Initialize 3Commas API
 api = init_threecommas_api(logger, config)
 if not api:
     sys.exit(0)
 
+# Threads used for fetching the data of multiple bots at the same time
+botrequestpool = ThreadPoolExecutor(max_workers=4)
+
 # Initialize or open the database
 db = open_tsl_db()
 cursor = db.cursor()
@@ -1342,91 +1525,106 @@ cursor = db.cursor()
 # Upgrade the database if needed
 upgrade_trailingstoploss_tp_db()
 
+# A SIGHUP ends the wait between cycles, so changes to the configuration
+# are applied directly
+wakeupevent = threading.Event()
+if hasattr(signal, "SIGHUP"):
+    signal.signal(signal.SIGHUP, lambda signum, frame: wakeupevent.set())
+
+# Keep the next processing time of the bots in memory. Changed times are
+# collected and written to the database once per cycle
+botnextprocesstimes = load_bot_next_process_times(
+    int(config.get("settings", "check-interval"))
+)
+changedbotprocesstimes = {}
+
 # TrailingStopLoss and TakeProfit %
 while True:
 
-    config = load_config()
-    logger.info(f"Reloaded configuration from '{datadir}/{program}.ini'")
+    # Configuration settings, which only change when the configuration is reloaded
+    if configchanged:
+        checkinterval = int(config.get("settings", "check-interval"))
+        monitorinterval = int(config.get("settings", "monitor-interval"))
 
-    # Configuration settings
-    checkinterval = int(config.get("settings", "check-interval"))
-    monitorinterval = int(config.get("settings", "monitor-interval"))
+        notifytrailingstart = config.getboolean("settings", "notify-trailing-start")
+        notifytrailingupdate = config.getboolean("settings", "notify-trailing-update")
+        notifytrailingreset = config.getboolean("settings", "notify-trailing-reset")
 
-    notifytrailingstart = config.getboolean("settings", "notify-trailing-start")
-    notifytrailingupdate = config.getboolean("settings", "notify-trailing-update")
-    notifytrailingreset = config.getboolean("settings", "notify-trailing-reset")
+        botsections = prepare_bot_sections(config)
+        configchanged = False
 
-    # Used to determine the correct interval
-    deals_to_monitor = 0
-
-    # Current time to determine which bots to process
+    # Current time to determine which bots to process. Scheduling uses the
+    # monotonic clock, and the wall clock is only used for the stored times
     starttime = int(time.time())
+    monotonicstarttime = time.monotonic()
+
+    for botids, sectionprofitconfig, sectionsafetyconfig, sectionsafetymode in botsections:
+        # Determine which of the configured bots must be processed now
+        duebots = []
+        for bot in botids:
+            nextprocesstime = get_bot_next_process_time(bot)
+
+            # Only process the bot if it's time for the next interval
+            if monotonicstarttime >= nextprocesstime:
+                duebots.append(bot)
+            elif logger.is_debug_enabled():
+                walltime = starttime + ceil(nextprocesstime - monotonicstarttime)
+                logger.debug(
+                    f"Bot {bot} will be processed after "
+                    f"{unix_timestamp_to_string(walltime, '%Y-%m-%d %H:%M:%S')}."
+                )
 
-    for section in config.sections():
-        if section.startswith("tsl_tp_"):
-            # Bot configuration for section
-            botids = json.loads(config.get(section, "botids"))
+        # Walk through all bots to process, of which the data is fetched at once
+        for bot, (boterror, botdata) in zip(duebots, fetch_bots_data(duebots)):
+            if botdata:
+                try:
+                    # Store all changes of this bot in one go
+                    with db_transaction():
+                        bot_deals_to_monitor = process_deals(
+                            botdata, sectionprofitconfig, sectionsafetyconfig,
+                            sectionsafetymode
+                        )
 
-            # Get and check the profit-config for this section
-            sectionprofitconfig = json.loads(config.get(section, "profit-config"))
-            sectionsafetyconfig = json.loads(config.get(section, "safety-config"))
-            sectionsafetymode = config.get(section, "safety-mode")
+                    # Determine new time to process this bot, based on the monitored deals
+                    interval = checkinterval if bot_deals_to_monitor == 0 else monitorinterval
+                    set_bot_next_process_time(
+                        bot, starttime + interval, monotonicstarttime + interval
+                    )
+                except Exception as err:
+                    logger.error(err)
+                    logger.error(traceback.print_exc())
+                    logger.error(traceback.print_tb(err.__traceback__))
+                    sys.exit(0)
+            else:
+                if boterror and "msg" in boterror:
+                    logger.error(f"Error occurred updating bots: {boterror['msg']}")
+                else:
+                    logger.error("Error occurred updating bots")
 
-            #TODO: add the 'shift' option in the future
-            if sectionsafetymode.lower() not in ("merge"):
-                logger.warning(
-                    f"Section {section} has an invalid \'safety-mode\'. Skipping this section!"
+                # Retry this bot shortly
+                set_bot_next_process_time(
+                    bot, starttime + monitorinterval, monotonicstarttime + monitorinterval
                 )
-                continue
 
-            # Walk through all bots configured
-            for bot in botids:
-                nextprocesstime = get_next_process_time(db, "bots", "botid", bot)
+    # Store the new processing times of all processed bots in one go
+    store_bot_next_process_times()
 
-                # Only process the bot if it's time for the next interval, or
-                # time exceeds the check interval (clock has changed somehow)
-                if starttime >= nextprocesstime or (
-                        abs(nextprocesstime - starttime) > checkinterval
-                ):
-                    boterror, botdata = api.request(
-                        entity="bots",
-                        action="show",
-                        action_id=str(bot),
-                    )
-                    if botdata:
-                        try:
-                            bot_deals_to_monitor = process_deals(
-                                botdata, sectionprofitconfig, sectionsafetyconfig, sectionsafetymode
-                            )
-
-                            # Determine new time to process this bot, based on the monitored deals
-                            newtime = starttime + (
-                                checkinterval if bot_deals_to_monitor == 0 else monitorinterval
-                            )
-                            set_next_process_time(db, "bots", "botid", bot, newtime)
-
-                            deals_to_monitor += bot_deals_to_monitor
-                        except Exception as err:
-                            logger.error(err)
-                            logger.error(traceback.print_exc())
-                            logger.error(traceback.print_tb(err.__traceback__))
-                            sys.exit(0)
-                    else:
-                        if boterror and "msg" in boterror:
-                            logger.error(f"Error occurred updating bots: {boterror['msg']}")
-                        else:
-                            logger.error("Error occurred updating bots")
-                else:
-                    logger.debug(
-                        f"Bot {bot} will be processed after "
-                        f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
-                    )
-        elif section not in ("settings"):
-            logger.warning(
-                f"Section '{section}' not processed (prefix 'tsl_tp_' missing)!",
-                False
-            )
+    # Sleep until the first bot must be processed again, but not longer than the
+    # check interval so config changes are picked up in time
+    nextprocesstime = monotonicstarttime + checkinterval
+    for botids, *_ in botsections:
+        for bot in botids:
+            nextprocesstime = min(nextprocesstime, get_bot_next_process_time(bot))
 
-    timeint = checkinterval if deals_to_monitor == 0 else monitorinterval
-    if not wait_time_interval(logger, notification, timeint, False):
+    timeint = max(1, ceil(nextprocesstime - time.monotonic()))
+    if not wait_time_interval(logger, notification, timeint, False, wakeupevent):
         break
+
+    # Reload the configuration when the file has been changed, so changes
+    # are picked up without a restart
+    newconfigmtime = get_config_mtime()
+    if newconfigmtime != configmtime:
+        config = load_config()
+        configmtime = newconfigmtime
+        configchanged = True
+        logger.info(f"Reloaded configuration from '{datadir}/{program}.ini'")